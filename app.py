@@ -2,8 +2,12 @@ import streamlit as st
 import sqlite3
 import pandas as pd
 import os
+import atexit
+import threading
+import uuid
 from datetime import datetime
 import io
+from streamlit.connections import BaseConnection
 
 # Page configuration
 st.set_page_config(
@@ -12,31 +16,104 @@ st.set_page_config(
     layout="wide"
 )
 
+# Shared by every progress write so sqlite3's statement cache reuses one prepared statement.
+# A wish that was already completed keeps its stored date, so editing its notes
+# doesn't move the completion date to today
+_UPSERT_LW = '''
+    INSERT OR REPLACE INTO lifetime_wishes_progress 
+    (save_id, lifetime_wish_id, completed, completed_date, notes)
+    VALUES (
+        :save_id,
+        :lifetime_wish_id,
+        :completed,
+        CASE WHEN :completed THEN COALESCE(
+            (SELECT completed_date FROM lifetime_wishes_progress
+             WHERE save_id = :save_id AND lifetime_wish_id = :lifetime_wish_id AND completed = 1),
+            :completed_date
+        ) END,
+        :notes
+    )
+'''
+
+@st.cache_resource
+def get_write_lock():
+    """Get the lock serializing writes to the shared connection across script runs."""
+    return threading.RLock()
+
+class SQLiteConnection(BaseConnection[sqlite3.Connection]):
+    """st.connection type for the tracker database, shared across reruns and sessions."""
+
+    def __init__(self, connection_name, **kwargs):
+        super().__init__(connection_name, **kwargs)
+        # Registered once per connection object rather than in _connect, so handles
+        # replaced by reset() aren't kept alive until the server shuts down
+        atexit.register(self.close)
+
+    def _connect(self, database='db/sims3_tracker.db', **kwargs):
+        conn = sqlite3.connect(database, check_same_thread=False, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        
+        # WAL lets reads proceed during writes and only syncs at checkpoints
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        conn.execute("PRAGMA cache_size = -20000")
+        # Ceiling only: SQLite maps just the file's bytes, so the whole DB stays mapped
+        conn.execute("PRAGMA mmap_size = 268435456")
+        conn.execute("PRAGMA foreign_keys = ON")
+        
+        # A new handle restarts total_changes at 0, so data versions also carry
+        # an id that is never reused, unlike id(conn) once an old handle is freed
+        self._handle_id = uuid.uuid4()
+        return conn
+
+    def data_version(self):
+        """Get a change token that moves whenever the database changes."""
+        conn = self._instance
+        # total_changes counts this handle's own writes, PRAGMA data_version moves
+        # when another connection (e.g. the loader script) commits
+        data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+        return (self._handle_id, conn.total_changes, data_version)
+
+    def close(self):
+        """Refresh query planner statistics and close the current handle."""
+        if self._raw_instance is not None:
+            self._raw_instance.execute("PRAGMA optimize")
+            self._raw_instance.close()
+            self._raw_instance = None
+
+def _get_connection():
+    return st.connection("sims3", type=SQLiteConnection)
+
 def get_db_connection():
-    """Get database connection."""
-    return sqlite3.connect('db/sims3_tracker.db')
+    """Get the shared database connection, reused across reruns and sessions."""
+    return _get_connection()._instance
 
-def get_saves():
-    """Get all save files."""
+def get_data_version():
+    """Get a change token that moves whenever the database changes."""
+    # Module globals are reset on every rerun, so the token comes from the shared connection
+    return _get_connection().data_version()
+
+@st.cache_data(ttl=300)
+def _get_saves(version):
     conn = get_db_connection()
     query = "SELECT * FROM saves ORDER BY is_active DESC, name"
-    saves = pd.read_sql_query(query, conn)
-    conn.close()
-    return saves
+    return pd.read_sql_query(query, conn)
+
+def get_saves():
+    """Get all save files."""
+    return _get_saves(get_data_version())
 
 def get_active_save():
     """Get the currently active save."""
     conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM saves WHERE is_active = 1 LIMIT 1")
-    save = cursor.fetchone()
-    conn.close()
+    save = conn.execute("SELECT * FROM saves WHERE is_active = 1 LIMIT 1").fetchone()
     if save:
-        return {"id": save[0], "name": save[1], "description": save[2]}
+        return {"id": save['id'], "name": save['name'], "description": save['description']}
     return None
 
-def get_lifetime_wishes_with_progress(save_id):
-    """Get all lifetime wishes with progress for a specific save."""
+@st.cache_data(ttl=300)
+def _get_lifetime_wishes_rows(save_id, version):
     conn = get_db_connection()
     query = '''
         SELECT 
@@ -52,74 +129,111 @@ def get_lifetime_wishes_with_progress(save_id):
         LEFT JOIN lifetime_wishes_progress lwp ON lw.id = lwp.lifetime_wish_id AND lwp.save_id = ?
         ORDER BY lw.source, lw.name
     '''
-    df = pd.read_sql_query(query, conn, params=[save_id])
-    conn.close()
-    return df
+    # Plain dicts rather than sqlite3.Row so the result can be cached
+    return [dict(row) for row in conn.execute(query, (save_id,))]
+
+def get_lifetime_wishes_rows(save_id):
+    """Get all lifetime wishes with progress for a specific save as a list of dicts."""
+    return _get_lifetime_wishes_rows(save_id, get_data_version())
+
+@st.cache_data(ttl=300)
+def _get_source_stats(save_id, version):
+    conn = get_db_connection()
+    query = '''
+        SELECT 
+            lw.source AS Source,
+            COUNT(*) AS Total,
+            SUM(COALESCE(lwp.completed, 0)) AS Completed,
+            ROUND(100.0 * SUM(COALESCE(lwp.completed, 0)) / COUNT(*), 1) AS "Completion %"
+        FROM lifetime_wishes lw
+        LEFT JOIN lifetime_wishes_progress lwp ON lw.id = lwp.lifetime_wish_id AND lwp.save_id = ?
+        GROUP BY lw.source
+        ORDER BY lw.source
+    '''
+    return pd.read_sql_query(query, conn, params=[save_id])
+
+def get_source_stats(save_id):
+    """Get total, completed and completion % of lifetime wishes per source for a specific save."""
+    return _get_source_stats(save_id, get_data_version())
+
+@st.cache_data(ttl=300)
+def _get_totals(save_id, version):
+    conn = get_db_connection()
+    row = conn.execute('''
+        SELECT 
+            COUNT(*),
+            COALESCE(SUM(lwp.completed), 0)
+        FROM lifetime_wishes lw
+        LEFT JOIN lifetime_wishes_progress lwp ON lw.id = lwp.lifetime_wish_id AND lwp.save_id = ?
+    ''', (save_id,)).fetchone()
+    return row[0], row[1]
+
+def get_totals(save_id):
+    """Get (total, completed) lifetime wish counts for a specific save."""
+    return _get_totals(save_id, get_data_version())
 
 def update_lifetime_wish_progress(save_id, lifetime_wish_id, completed, notes=""):
     """Update progress for a lifetime wish."""
     conn = get_db_connection()
-    cursor = conn.cursor()
     
     completed_date = datetime.now().strftime('%Y-%m-%d') if completed else None
     
-    cursor.execute('''
-        INSERT OR REPLACE INTO lifetime_wishes_progress 
-        (save_id, lifetime_wish_id, completed, completed_date, notes)
-        VALUES (?, ?, ?, ?, ?)
-    ''', (save_id, lifetime_wish_id, completed, completed_date, notes))
-    
-    conn.commit()
-    conn.close()
+    with get_write_lock():
+        conn.execute(_UPSERT_LW, {
+            "save_id": save_id,
+            "lifetime_wish_id": lifetime_wish_id,
+            "completed": completed,
+            "completed_date": completed_date,
+            "notes": notes
+        })
 
 def create_new_save(name, description=""):
     """Create a new save file."""
     conn = get_db_connection()
-    cursor = conn.cursor()
     
-    cursor.execute('''
-        INSERT INTO saves (name, description)
-        VALUES (?, ?)
-    ''', (name, description))
-    
-    conn.commit()
-    conn.close()
+    with get_write_lock():
+        conn.execute('''
+            INSERT INTO saves (name, description)
+            VALUES (?, ?)
+        ''', (name, description))
 
 def set_active_save(save_id):
     """Set a save as active."""
     conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # First, set all saves to inactive
-    cursor.execute("UPDATE saves SET is_active = 0")
     
-    # Then set the selected save as active
-    cursor.execute("UPDATE saves SET is_active = 1 WHERE id = ?", (save_id,))
+    # A single statement flips every save at once, so exactly one stays active
+    with get_write_lock():
+        conn.execute(
+            "UPDATE saves SET is_active = CASE WHEN id = ? THEN 1 ELSE 0 END",
+            (save_id,)
+        )
     
-    conn.commit()
-    conn.close()
+    # Refresh this session's memoized active save
+    st.session_state.active_save = get_active_save()
 
-def export_all_data():
-    """Export all data to CSV format."""
+@st.cache_data(ttl=600)
+def _export_all_data(version):
     conn = get_db_connection()
     
-    # Get all data
-    saves_df = pd.read_sql_query("SELECT * FROM saves", conn)
-    lifetime_wishes_df = pd.read_sql_query("SELECT * FROM lifetime_wishes", conn)
-    progress_df = pd.read_sql_query('''
-        SELECT 
-            s.name as save_name,
-            lw.name as lifetime_wish_name,
-            lw.source,
-            lwp.completed,
-            lwp.completed_date,
-            lwp.notes
-        FROM lifetime_wishes_progress lwp
-        JOIN saves s ON lwp.save_id = s.id
-        JOIN lifetime_wishes lw ON lwp.lifetime_wish_id = lw.id
-    ''', conn)
-    
-    conn.close()
+    # Read every sheet from one snapshot so the backup can't mix data from before
+    # and after a concurrent commit; the lock keeps other threads' writes on the
+    # shared connection out of this read transaction
+    with get_write_lock(), conn:
+        conn.execute("BEGIN")
+        saves_df = pd.read_sql_query("SELECT * FROM saves", conn)
+        lifetime_wishes_df = pd.read_sql_query("SELECT * FROM lifetime_wishes", conn)
+        progress_df = pd.read_sql_query('''
+            SELECT 
+                s.name as save_name,
+                lw.name as lifetime_wish_name,
+                lw.source,
+                lwp.completed,
+                lwp.completed_date,
+                lwp.notes
+            FROM lifetime_wishes_progress lwp
+            JOIN saves s ON lwp.save_id = s.id
+            JOIN lifetime_wishes lw ON lwp.lifetime_wish_id = lw.id
+        ''', conn)
     
     # Create a BytesIO object to store the Excel file
     output = io.BytesIO()
@@ -129,8 +243,61 @@ def export_all_data():
         lifetime_wishes_df.to_excel(writer, sheet_name='Lifetime Wishes', index=False)
         progress_df.to_excel(writer, sheet_name='Progress', index=False)
     
-    output.seek(0)
-    return output
+    return output.getvalue()
+
+def export_all_data():
+    """Export all data as Excel file bytes, reusing the last export if nothing changed."""
+    # The data version also moves on commits made outside the app, so a reused
+    # export is never older than the database
+    return _export_all_data(get_data_version())
+
+def _save_wish(save_id, lifetime_wish_id):
+    """Save a lifetime wish's checkbox and notes when either widget changes."""
+    update_lifetime_wish_progress(
+        save_id,
+        lifetime_wish_id,
+        st.session_state[f"wish_{save_id}_{lifetime_wish_id}"],
+        st.session_state[f"notes_{save_id}_{lifetime_wish_id}"]
+    )
+
+@st.fragment
+def render_wish(save_id, wish):
+    """Render a single lifetime wish; its widgets only rerun this fragment."""
+    # Widget state is kept by key, so keys include the save to keep one save's
+    # ticks and notes from carrying over (and being written) into another
+    col1, col2, col3 = st.columns([1, 4, 2])
+    
+    with col1:
+        # Checkbox for completion, saved by its callback before the fragment reruns
+        completed = st.checkbox(
+            "Done",
+            value=bool(wish['completed']),
+            key=f"wish_{save_id}_{wish['id']}",
+            on_change=_save_wish,
+            args=(save_id, wish['id'])
+        )
+    
+    with col2:
+        # Icon and name
+        icon_display = "📁" if wish['icon_name'] != "PLACEHOLDER" else "🔲"
+        st.write(f"{icon_display} **{wish['name']}**")
+        if wish['icon_name'] != "PLACEHOLDER":
+            st.caption(f"Icon: {wish['icon_name']}")
+        if completed:
+            # wish is the row from the last full run, so a fresh tick has no date yet
+            completed_date = wish['completed_date'] or datetime.now().strftime('%Y-%m-%d')
+            st.success(f"✅ Completed on {completed_date}")
+    
+    with col3:
+        # Notes, saved once on Enter or blur rather than compared on every rerun
+        st.text_input(
+            "Notes",
+            value=wish['notes'] or "",
+            key=f"notes_{save_id}_{wish['id']}",
+            placeholder="Add notes...",
+            on_change=_save_wish,
+            args=(save_id, wish['id'])
+        )
 
 # Main app
 def main():
@@ -142,8 +309,10 @@ def main():
         st.code("python3 db/scripts/db_create.py")
         return
     
-    # Get active save
-    active_save = get_active_save()
+    # Get active save, memoized per session until set_active_save changes it
+    if st.session_state.get("active_save") is None:
+        st.session_state.active_save = get_active_save()
+    active_save = st.session_state.active_save
     if not active_save:
         st.error("No active save found! Please create a save file first.")
         return
@@ -156,18 +325,16 @@ def main():
     with tab1:
         st.header("📊 Progress Overview")
         
-        # Get lifetime wishes data
-        df = get_lifetime_wishes_with_progress(active_save['id'])
+        # Get lifetime wishes counts
+        total_wishes, completed_wishes = get_totals(active_save['id'])
         
-        if df.empty:
+        if total_wishes == 0:
             st.warning("No lifetime wishes found. Please load the lifetime wishes data first.")
             st.code("python3 db/scripts/load_lifetime_wishes.py")
             return
         
         # Overall stats
-        total_wishes = len(df)
-        completed_wishes = len(df[df['completed'] == 1])
-        completion_percentage = (completed_wishes / total_wishes * 100) if total_wishes > 0 else 0
+        completion_percentage = completed_wishes / total_wishes * 100
         
         col1, col2, col3 = st.columns(3)
         with col1:
@@ -182,12 +349,8 @@ def main():
         
         # Stats by source
         st.subheader("Progress by Expansion Pack")
-        source_stats = df.groupby('source').agg({
-            'completed': ['count', 'sum']
-        }).round(1)
-        source_stats.columns = ['Total', 'Completed']
-        source_stats['Completion %'] = (source_stats['Completed'] / source_stats['Total'] * 100).round(1)
-        st.dataframe(source_stats, use_container_width=True)
+        source_stats = get_source_stats(active_save['id'])
+        st.dataframe(source_stats, use_container_width=True, hide_index=True)
     
     with tab2:
         st.header("💾 Save Files")
@@ -196,7 +359,7 @@ def main():
         
         # Display current saves
         st.subheader("Current Save Files")
-        for _, save in saves_df.iterrows():
+        for save in saves_df.to_dict('records'):
             col1, col2, col3 = st.columns([3, 1, 1])
             with col1:
                 status = "🟢 Active" if save['is_active'] else "⚪ Inactive"
@@ -206,7 +369,7 @@ def main():
             with col2:
                 if st.button("Activate", key=f"activate_{save['id']}"):
                     set_active_save(save['id'])
-                    st.experimental_rerun()
+                    st.rerun()
             with col3:
                 st.write(f"Created: {save['created_date']}")
         
@@ -221,7 +384,7 @@ def main():
                     try:
                         create_new_save(new_save_name.strip(), new_save_desc.strip())
                         st.success(f"Created save: {new_save_name}")
-                        st.experimental_rerun()
+                        st.rerun()
                     except Exception as e:
                         st.error(f"Error creating save: {e}")
                 else:
@@ -231,9 +394,9 @@ def main():
         st.header("✅ Lifetime Wishes")
         
         # Get lifetime wishes data
-        df = get_lifetime_wishes_with_progress(active_save['id'])
+        wishes = get_lifetime_wishes_rows(active_save['id'])
         
-        if df.empty:
+        if not wishes:
             st.warning("No lifetime wishes found. Please load the lifetime wishes data first.")
             return
         
@@ -242,7 +405,7 @@ def main():
         with col1:
             source_filter = st.selectbox(
                 "Filter by Expansion Pack",
-                ["All"] + sorted(df['source'].unique().tolist())
+                ["All"] + sorted({wish['source'] for wish in wishes})
             )
         with col2:
             status_filter = st.selectbox(
@@ -250,64 +413,23 @@ def main():
                 ["All", "Completed", "Not Completed"]
             )
         
-        # Apply filters
-        filtered_df = df.copy()
-        if source_filter != "All":
-            filtered_df = filtered_df[filtered_df['source'] == source_filter]
-        if status_filter == "Completed":
-            filtered_df = filtered_df[filtered_df['completed'] == 1]
-        elif status_filter == "Not Completed":
-            filtered_df = filtered_df[filtered_df['completed'] == 0]
-        
-        # Group by source
-        sources = filtered_df['source'].unique()
+        # Apply filters and group by source
+        wishes_by_source = {}
+        for wish in wishes:
+            if source_filter != "All" and wish['source'] != source_filter:
+                continue
+            if status_filter == "Completed" and wish['completed'] != 1:
+                continue
+            if status_filter == "Not Completed" and wish['completed'] != 0:
+                continue
+            wishes_by_source.setdefault(wish['source'], []).append(wish)
         
-        for source in sorted(sources):
-            source_df = filtered_df[filtered_df['source'] == source]
+        for source in sorted(wishes_by_source):
+            source_wishes = wishes_by_source[source]
             
-            with st.expander(f"📦 {source} ({len(source_df)} wishes)", expanded=(len(sources) == 1)):
-                for _, wish in source_df.iterrows():
-                    col1, col2, col3 = st.columns([1, 4, 2])
-                    
-                    with col1:
-                        # Checkbox for completion
-                        completed = st.checkbox(
-                            "Done",
-                            value=bool(wish['completed']),
-                            key=f"wish_{wish['id']}"
-                        )
-                        
-                        # Update progress if changed
-                        if completed != bool(wish['completed']):
-                            update_lifetime_wish_progress(active_save['id'], wish['id'], completed)
-                            st.experimental_rerun()
-                    
-                    with col2:
-                        # Icon and name
-                        icon_display = "📁" if wish['icon_name'] != "PLACEHOLDER" else "🔲"
-                        st.write(f"{icon_display} **{wish['name']}**")
-                        if wish['icon_name'] != "PLACEHOLDER":
-                            st.caption(f"Icon: {wish['icon_name']}")
-                        if wish['completed'] and wish['completed_date']:
-                            st.success(f"✅ Completed on {wish['completed_date']}")
-                    
-                    with col3:
-                        # Notes
-                        notes = st.text_input(
-                            "Notes",
-                            value=wish['notes'] or "",
-                            key=f"notes_{wish['id']}",
-                            placeholder="Add notes..."
-                        )
-                        
-                        # Update notes if changed
-                        if notes != (wish['notes'] or ""):
-                            update_lifetime_wish_progress(
-                                active_save['id'], 
-                                wish['id'], 
-                                bool(wish['completed']), 
-                                notes
-                            )
+            with st.expander(f"📦 {source} ({len(source_wishes)} wishes)", expanded=(len(wishes_by_source) == 1)):
+                for wish in source_wishes:
+                    render_wish(active_save['id'], wish)
     
     with tab4:
         st.header("⚙️ Manage Data")
@@ -341,8 +463,6 @@ def main():
             count = cursor.fetchone()[0]
             st.write(f"**{table}**: {count} records")
         
-        conn.close()
-        
         # Reload data
         st.subheader("🔄 Reload Data")
         st.write("Reload lifetime wishes from CSV file.")
@@ -161,10 +161,12 @@ def create_database():
     
     # Create indexes for better performance
     cursor.execute('CREATE INDEX idx_lifetime_wishes_source ON lifetime_wishes(source)')
-    cursor.execute('CREATE INDEX idx_lifetime_wishes_progress_save ON lifetime_wishes_progress(save_id)')
+    # Covers the save/wish join so progress is read from the index alone
+    cursor.execute('CREATE INDEX idx_lwp_save_wish ON lifetime_wishes_progress(save_id, lifetime_wish_id, completed, completed_date, notes)')
     cursor.execute('CREATE INDEX idx_collections_progress_save ON collections_progress(save_id)')
     cursor.execute('CREATE INDEX idx_skills_progress_save ON skills_progress(save_id)')
     cursor.execute('CREATE INDEX idx_careers_progress_save ON careers_progress(save_id)')
+    cursor.execute('CREATE INDEX idx_saves_active ON saves(is_active) WHERE is_active = 1')
     
     # Insert a default save file
     cursor.execute('''
@@ -6,67 +6,58 @@ Load lifetime wishes from CSV into the new database structure.
 import sqlite3
 import csv
 import os
-import glob
 
-def find_icon_file(name):
+# Characters stripped or replaced when turning a wish name into an icon filename
+_TRANS = str.maketrans({"'": "", '"': "", ",": "", ":": "", "-": "_", " ": "_"})
+
+# Specific mappings for known icon files that don't follow the naming patterns
+_SPECIFIC = {
+    "season_traveler": "seasoned_traveler.png",
+    "fashion_phenomenon": "w_lifetime_stylist.png",
+    "paranormal_profiteer": "w_lifetime_ghosthunter.png",
+    "nectar_making": "nectar_making.png",
+    # Add more specific mappings as needed
+}
+
+def scan_icon_files(icon_dir="icons/lifetime_wishes"):
+    """
+    Scan the icon directory once.
+    Returns the set of PNG filenames and a dict mapping each name without
+    its extension to the filename.
+    """
+    if not os.path.exists(icon_dir):
+        return set(), {}
+    
+    with os.scandir(icon_dir) as entries:
+        icon_set = {entry.name for entry in entries if entry.name.endswith(".png")}
+    icon_bases = {f[:-4]: f for f in sorted(icon_set)}
+    return icon_set, icon_bases
+
+def find_icon_file(name, icon_set, icon_bases):
     """
     Find the corresponding icon file for a lifetime wish.
     Returns the filename if found, 'PLACEHOLDER' if not found.
     """
     # Convert name to potential filename patterns
     # Remove special characters and convert to lowercase
-    clean_name = name.lower()
-    clean_name = clean_name.replace("'", "")
-    clean_name = clean_name.replace('"', '')
-    clean_name = clean_name.replace(',', '')
-    clean_name = clean_name.replace(':', '')
-    clean_name = clean_name.replace('-', '_')
-    clean_name = clean_name.replace(' ', '_')
-    clean_name = clean_name.replace('__', '_')
+    clean_name = name.lower().translate(_TRANS).replace('__', '_')
     
-    # Look for icon files in the icons/lifetime_wishes directory
-    icon_dir = "icons/lifetime_wishes"
-    if not os.path.exists(icon_dir):
-        return "PLACEHOLDER"
-    
-    # Get all PNG files in the directory
-    png_files = glob.glob(os.path.join(icon_dir, "*.png"))
-    
-    # Extract just the filenames without path
-    icon_files = [os.path.basename(f) for f in png_files]
+    # Try some specific mappings for known files
+    specific = _SPECIFIC.get(clean_name)
+    if specific in icon_set:
+        return specific
     
     # Try different matching patterns
-    patterns_to_try = [
-        f"{clean_name}.png",
-        f"w_lifetime_{clean_name}.png",
-        f"w_{clean_name}.png",
-    ]
-    
-    # Also try some specific mappings for known files
-    specific_mappings = {
-        "season_traveler": "seasoned_traveler.png",
-        "fashion_phenomenon": "w_lifetime_stylist.png",
-        "paranormal_profiteer": "w_lifetime_ghosthunter.png",
-        "nectar_making": "nectar_making.png",
-        # Add more specific mappings as needed
-    }
-    
-    if clean_name in specific_mappings:
-        if specific_mappings[clean_name] in icon_files:
-            return specific_mappings[clean_name]
-    
-    # Try each pattern
-    for pattern in patterns_to_try:
-        if pattern in icon_files:
+    for pattern in (f"{clean_name}.png", f"w_lifetime_{clean_name}.png", f"w_{clean_name}.png"):
+        if pattern in icon_set:
             return pattern
     
     # Try partial matching (icon filename contains part of the name)
-    name_parts = clean_name.split('_')
-    for icon_file in icon_files:
-        icon_base = icon_file.replace('.png', '')
+    name_parts = [part for part in clean_name.split('_') if len(part) > 3]
+    for icon_base, icon_file in icon_bases.items():
         # Check if any significant part of the name matches
         for part in name_parts:
-            if len(part) > 3 and part in icon_base:
+            if part in icon_base:
                 return icon_file
     
     return "PLACEHOLDER"
@@ -74,19 +65,15 @@ def find_icon_file(name):
 def load_lifetime_wishes():
     """Load lifetime wishes from CSV file."""
     
-    # Connect to database
-    conn = sqlite3.connect('db/sims3_tracker.db')
-    cursor = conn.cursor()
-    
-    # Clear existing lifetime wishes
-    cursor.execute("DELETE FROM lifetime_wishes")
-    
     csv_file = "data/lifetime_wishes.csv"
     if not os.path.exists(csv_file):
         print(f"Error: {csv_file} not found!")
         return
     
-    loaded_count = 0
+    # Look for icon files in the icons/lifetime_wishes directory
+    icon_set, icon_bases = scan_icon_files()
+    
+    rows = []
     icon_count = 0
     placeholder_count = 0
     
@@ -99,19 +86,27 @@ def load_lifetime_wishes():
             completion_type = row['Completion_Type'].strip()
             
             # Find icon
-            icon_name = find_icon_file(name)
+            icon_name = find_icon_file(name, icon_set, icon_bases)
             if icon_name != "PLACEHOLDER":
                 icon_count += 1
             else:
                 placeholder_count += 1
             
-            # Insert into database
-            cursor.execute('''
-                INSERT INTO lifetime_wishes (name, source, completion_type, icon_name)
-                VALUES (?, ?, ?, ?)
-            ''', (name, source, completion_type, icon_name))
-            
-            loaded_count += 1
+            rows.append((name, source, completion_type, icon_name))
+    
+    loaded_count = len(rows)
+    
+    # Connect to database
+    conn = sqlite3.connect('db/sims3_tracker.db')
+    cursor = conn.cursor()
+    
+    # Replace existing lifetime wishes in a single transaction
+    cursor.execute("BEGIN")
+    cursor.execute("DELETE FROM lifetime_wishes")
+    cursor.executemany('''
+        INSERT INTO lifetime_wishes (name, source, completion_type, icon_name)
+        VALUES (?, ?, ?, ?)
+    ''', rows)
     
     # Commit changes
     conn.commit()